@@ -1,4 +1,4 @@
-VERSION = "0.1.1"
+VERSION = "0.1.2"
 __version__ = VERSION
 
 from photorec_sorter import cli  # noqa
@@ -4,7 +4,15 @@ import argparse
 
 from loguru import logger
 
-from photorec_sorter.recovery import sort_photorec_folder
+from photorec_sorter.file_copier import LINK_MODES
+from photorec_sorter.recovery import DEFAULT_WORKER_COUNT, sort_photorec_folder
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1: {value}")
+    return number
 
 
 def get_args():
@@ -71,6 +79,27 @@ accordingly split into separate directories."
         required=False,
         help="sets the filename to the exif date and time if possible - otherwise keep the original filename",
     )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=positive_int,
+        default=DEFAULT_WORKER_COUNT,
+        required=False,
+        help="number of files to copy in parallel (use 1 for spinning disks)",
+    )
+    parser.add_argument(
+        "-l",
+        "--link",
+        choices=LINK_MODES,
+        default="copy",
+        required=False,
+        help=(
+            "link files into the destination instead of copying them; 'hard' "
+            "links share the file with the source, 'reflink' only shares its "
+            "data until modified (btrfs, XFS). Source and destination must "
+            "be on the same file system"
+        ),
+    )
 
     return parser.parse_args()
 
@@ -88,6 +117,8 @@ def main_cli():
         enable_keep_filename=args.keep_filename,
         enable_datetime_filename=args.enable_datetime_filename,
         min_event_delta_days=args.min_event_delta,
+        worker_count=args.workers,
+        link_mode=args.link,
     )
 
 
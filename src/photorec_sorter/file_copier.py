@@ -0,0 +1,184 @@
+import errno
+import os
+import shutil
+
+# dependencies
+from loguru import logger
+
+try:
+    import fcntl
+except ImportError:
+    # not available on Windows
+    fcntl = None
+
+LINK_MODES = ["copy", "hard", "reflink"]
+
+# ioctl request number of FICLONE from <linux/fs.h>
+_FICLONE = 0x40049409
+
+# without it, os.open() opens files in text mode on Windows
+_O_BINARY = getattr(os, "O_BINARY", 0)
+
+# Recovered files are mostly photos and videos of a few MiB or more, so a
+# regular copy uses a much larger buffer than shutil's default of 64 KiB.
+COPY_BUFSIZE = 4 * 1024 * 1024
+
+# the most copy_file_range() is asked to copy at once
+_COPY_FILE_RANGE_MAX_COUNT = 1024 * 1024 * 1024
+
+# not available on Windows and macOS
+_HAS_FADVISE = hasattr(os, "posix_fadvise")
+
+# copy_file_range() fails with one of these if the kernel or the file systems
+# involved do not support it, in which case a regular copy is done instead.
+_COPY_FILE_RANGE_UNSUPPORTED_ERRNOS = {
+    errno.ENOSYS,
+    errno.EXDEV,
+    errno.EINVAL,
+    errno.EOPNOTSUPP,
+}
+
+# Linking fails with one of these if the file system doesn't support the link
+# type, in which case the file is copied instead.
+_LINK_UNSUPPORTED_ERRNOS = {
+    errno.EXDEV,
+    errno.EINVAL,
+    errno.EOPNOTSUPP,
+    errno.ENOTTY,
+    errno.EPERM,
+}
+
+# link modes that fell back to copying already, which is only logged once
+_link_fallback_link_modes = set()
+
+
+def _copy_data(src, dst, src_fd, dst_fd, size):
+    # Recovered files are read once and their copies aren't read at all
+    # (until the JPG sorting, which only reads the EXIF headers), so the
+    # kernel is told to read ahead and not to keep any of it in the page cache.
+    if _HAS_FADVISE:
+        os.posix_fadvise(src_fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+    remaining = size
+    if hasattr(os, "copy_file_range"):
+        try:
+            while remaining > 0:
+                copied = os.copy_file_range(
+                    src_fd, dst_fd, min(remaining, _COPY_FILE_RANGE_MAX_COUNT)
+                )
+                if copied == 0:
+                    break
+                remaining -= copied
+        except OSError as e:
+            if e.errno not in _COPY_FILE_RANGE_UNSUPPORTED_ERRNOS:
+                raise
+
+    if 0 < remaining == size:
+        # Nothing was copied yet, so leave it to shutil.copyfile(), which
+        # uses the fastest way of the platform (e.g., sendfile() on Linux,
+        # fcopyfile() on macOS). It simply overwrites the empty dst.
+        shutil.copyfile(src, dst)
+    elif remaining > 0:
+        # Copy the rest the regular way, continuing at the current positions
+        # of both files.
+        with open(src_fd, "rb", closefd=False) as fsrc, open(
+            dst_fd, "wb", closefd=False
+        ) as fdst:
+            shutil.copyfileobj(fsrc, fdst, COPY_BUFSIZE)
+
+    if _HAS_FADVISE:
+        os.posix_fadvise(src_fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        os.posix_fadvise(dst_fd, 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+def _warn_link_fallback(link_mode, reason):
+    # e.g., EPERM for hard links to files owned by another user with
+    # fs.protected_hardlinks enabled, as when PhotoRec was run as root
+    if link_mode not in _link_fallback_link_modes:
+        _link_fallback_link_modes.add(link_mode)
+        logger.warning(
+            f"Can't create {link_mode} links ({reason}), "
+            "copying the files instead."
+        )
+
+
+def _reflink(src_fd, dst_fd):
+    if fcntl is None:
+        _warn_link_fallback("reflink", "not supported on this platform")
+        return False
+    try:
+        fcntl.ioctl(dst_fd, _FICLONE, src_fd)
+    except OSError as e:
+        if e.errno not in _LINK_UNSUPPORTED_ERRNOS:
+            raise
+        _warn_link_fallback("reflink", e)
+        return False
+    return True
+
+
+def transfer_file(
+    src: str,
+    dst: str,
+    link_mode: str,
+    src_stat: os.stat_result = None,
+    src_fd: int = None,
+):
+    """Put the file src at dst, as specified by link_mode (see LINK_MODES).
+
+    dst is always created exclusively, i.e., FileExistsError is raised if it
+    exists already. This makes it safe to call from several threads at once.
+
+    A copy only keeps the data and the access/modification times of src;
+    permission bits and extended attributes are not copied, as files
+    recovered by PhotoRec don't carry any worth keeping. On Linux, the data is
+    copied within the kernel by copy_file_range(), which btrfs and XFS even
+    turn into a reflink.
+
+    A hard link shares the file with the source, a reflink only shares its
+    data until either file is modified (btrfs, XFS). Both just take a single
+    metadata operation, however large the file is. Where the file system
+    doesn't support the requested link, the file is copied instead.
+
+    If the caller already has the stat result of src (e.g., from an
+    os.DirEntry), it can be passed as src_stat to save a stat() call.
+    Likewise, if src is open already, its file descriptor can be passed as
+    src_fd to save an open() call; its file position is changed then.
+    """
+    if link_mode == "hard":
+        try:
+            os.link(src, dst)
+            return
+        except OSError as e:
+            if e.errno not in _LINK_UNSUPPORTED_ERRNOS:
+                raise
+            _warn_link_fallback(link_mode, e)
+
+    # The destination is created first, so that a name taken already (e.g.,
+    # by a previous run) costs just this one failing open().
+    dst_fd = os.open(
+        dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL | _O_BINARY, 0o666
+    )
+    try:
+        try:
+            close_src_fd = src_fd is None
+            if close_src_fd:
+                src_fd = os.open(src, os.O_RDONLY | _O_BINARY)
+            else:
+                os.lseek(src_fd, 0, os.SEEK_SET)
+            try:
+                if src_stat is None:
+                    src_stat = os.fstat(src_fd)
+                if not (link_mode == "reflink" and _reflink(src_fd, dst_fd)):
+                    _copy_data(src, dst, src_fd, dst_fd, src_stat.st_size)
+            finally:
+                if close_src_fd:
+                    os.close(src_fd)
+        finally:
+            os.close(dst_fd)
+    except BaseException:
+        # A partial copy left behind would be taken as complete by the next
+        # run (FileExistsError), so it's never repaired.
+        os.unlink(dst)
+        raise
+
+    os.utime(dst, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
@@ -2,21 +2,39 @@ import os
 import shutil
 
 
+def getNumberOfFilesInFolder(path, cap=None):
+    """Count the entries of a directory without listing them all at once.
+
+    If cap is given, counting stops as soon as there are more entries than
+    that, so it's cheap to check whether a huge directory is over a limit.
+    """
+    numberOfFiles = 0
+    with os.scandir(path) as it:
+        for _ in it:
+            numberOfFiles += 1
+            if cap is not None and numberOfFiles > cap:
+                break
+    return numberOfFiles
+
+
 def limitFilesPerFolder(folder, max_files_per_folder):
     for root, dirs, files in os.walk(folder, topdown=False):
         for dir in dirs:
             dirPath = os.path.join(root, dir)
-            filesInFolder = len(os.listdir(dirPath))
-            if filesInFolder > max_files_per_folder:
+            if (
+                getNumberOfFilesInFolder(dirPath, max_files_per_folder)
+                > max_files_per_folder
+            ):
+                filesInFolderList = os.listdir(dirPath)
+                filesInFolder = len(filesInFolderList)
                 numberOfSubfolders = (
                     (filesInFolder - 1) // max_files_per_folder
                 ) + 1
                 for subFolderNumber in range(1, numberOfSubfolders + 1):
                     subFolderPath = os.path.join(dirPath, str(subFolderNumber))
-                    if not os.path.exists(subFolderPath):
-                        os.mkdir(subFolderPath)
+                    os.makedirs(subFolderPath, exist_ok=True)
                 fileCounter = 1
-                for file in os.listdir(dirPath):
+                for file in filesInFolderList:
                     source = os.path.join(dirPath, file)
                     if os.path.isfile(source):
                         destDir = str(
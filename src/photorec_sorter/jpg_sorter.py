@@ -58,8 +58,7 @@ def postprocessImage(images, imageDirectory, fileName):
 
 # Creates the requested path recursively.
 def createPath(newPath):
-    if not os.path.exists(newPath):
-        os.makedirs(newPath)
+    os.makedirs(newPath, exist_ok=True)
 
 
 # Pass None for month to create 'year/eventNumber' directories instead of
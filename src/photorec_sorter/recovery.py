@@ -1,5 +1,18 @@
+import calendar
+import io
+import multiprocessing
 import os
-import shutil
+import re
+import sys
+import threading
+from collections import defaultdict
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from itertools import repeat
 from time import strftime, strptime
 
 # dependencies
@@ -9,20 +22,318 @@ from loguru import logger
 # project libraries
 from photorec_sorter import jpg_sorter
 from photorec_sorter import files_per_folder_limiter
+from photorec_sorter import file_copier
+
+# Same default as ThreadPoolExecutor for I/O bound work, but scaled up a bit
+# further since copying spends nearly all of its time waiting on the disk.
+DEFAULT_WORKER_COUNT = min(32, (os.cpu_count() or 1) * 4)
+
+# number of processed files after which progress is reported
+LOG_FREQUENCY_FILE_COUNT = 1000
+
+# The EXIF data of a JPEG is at most 64 KiB and sits right at the start of the
+# file, so only that much of a JPEG is handed to exifread. Other formats (like
+# TIFF based RAW files or HEIC) can keep it anywhere in the file, so those are
+# still parsed as a whole.
+EXIF_HEADER_SIZE = 128 * 1024
+
+# start of image (SOI) marker every JPEG file begins with
+_JPEG_SOI_MARKER = b"\xff\xd8"
+
+_EXIF_DATETIME_PATTERN = re.compile(
+    r"(\d{4}):(0[1-9]|1[0-2]):(0[1-9]|[12]\d|3[01]) "
+    r"([01]\d|2[0-3]):([0-5]\d):([0-5]\d)"
+)
+
+
+# Neither of the following two is used by sort_photorec_folder any more
+# (progress is reported as a running count instead), but both are kept for
+# callers of this module.
 
 
 def getNumberOfFilesInFolderRecursively(start_path="."):
+    # DirEntry.is_dir()/is_file() use the file type returned by the directory
+    # read itself, so this avoids an extra stat() per file.
     numberOfFiles = 0
-    for dirpath, dirnames, filenames in os.walk(start_path):
-        for f in filenames:
-            fp = os.path.join(dirpath, f)
-            if os.path.isfile(fp):
-                numberOfFiles += 1
+    stack = [start_path]
+    while stack:
+        path = stack.pop()
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        numberOfFiles += 1
+        except OSError as e:
+            # skipped like os.walk() does
+            logger.warning(f"Skipping unreadable directory {path}: {e}")
     return numberOfFiles
 
 
-def getNumberOfFilesInFolder(path):
-    return len(os.listdir(path))
+def getNumberOfFilesInFolder(path, cap=None):
+    return files_per_folder_limiter.getNumberOfFilesInFolder(path, cap)
+
+
+def _is_gil_enabled():
+    # sys._is_gil_enabled() only exists as of Python 3.13
+    return getattr(sys, "_is_gil_enabled", lambda: True)()
+
+
+def _iter_directories(root):
+    """Yield the files of each directory below root as a list of os.DirEntry.
+
+    Hidden directories (like .snapshot) are skipped, and symlinked
+    directories are not followed. Directories that can't be read (e.g., due to
+    missing permissions) are skipped with a warning, like os.walk() does.
+    """
+    stack = [root]
+    while stack:
+        path = stack.pop()
+        files = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not entry.name.startswith("."):
+                            stack.append(entry.path)
+                    elif entry.is_file():
+                        files.append(entry)
+        except OSError as e:
+            logger.warning(f"Skipping unreadable directory {path}: {e}")
+            continue
+        yield files
+
+
+def _group_by_extension(source_entries):
+    source_entries_by_extension = {}
+    for source_entry in source_entries:
+        extension = os.path.splitext(source_entry.name)[1][1:].lower()
+        source_entries_by_extension.setdefault(extension, []).append(
+            source_entry
+        )
+    return source_entries_by_extension
+
+
+def _getExifCreationTime(image):
+    header = image.read(EXIF_HEADER_SIZE)
+    if header.startswith(_JPEG_SOI_MARKER):
+        exifFile = io.BytesIO(header)
+    else:
+        exifFile = image
+
+    try:
+        # DateTimeDigitized is the last of the tags used by
+        # getMinimumCreationTime, so there's no need to parse any further.
+        exifTags = exifread.process_file(
+            exifFile, details=False, stop_tag="DateTimeDigitized"
+        )
+    except (KeyError, Exception) as e:
+        logger.warning(f"EXIF error in {image.name}: {e}")
+        raise
+
+    creationTime = jpg_sorter.getMinimumCreationTime(exifTags)
+    if not creationTime:
+        raise ValueError("No creation time found in EXIF")
+
+    # Reformatting "YYYY:MM:DD HH:MM:SS" to "YYYYMMDD_HHMMSS" only takes
+    # removing the separators, which is much cheaper than strptime/strftime.
+    # Anything unusual (including days past the end of the month) still goes
+    # through them for validation.
+    creationTime = str(creationTime)
+    match = _EXIF_DATETIME_PATTERN.fullmatch(creationTime)
+    if match:
+        year, month, day = map(int, match.group(1, 2, 3))
+        if year >= 1 and day <= calendar.monthrange(year, month)[1]:
+            return (
+                "".join(match.group(1, 2, 3))
+                + "_"
+                + "".join(match.group(4, 5, 6))
+            )
+
+    creationTime = strptime(creationTime, "%Y:%m:%d %H:%M:%S")
+    return strftime("%Y%m%d_%H%M%S", creationTime)
+
+
+def _transfer_new_file(
+    source_file_path, dest_file_path, link_mode, source_stat, source_fd=None
+):
+    try:
+        file_copier.transfer_file(
+            source_file_path, dest_file_path, link_mode, source_stat, source_fd
+        )
+    except FileExistsError:
+        # copied by a previous run already
+        pass
+
+
+class _DatetimeNameIndices:
+    """Remembers the next index to try for each datetime filename that was
+    taken already, so that files with the same EXIF date/time don't all try
+    the names from the first one again. Shared by the worker threads.
+
+    Only date/times that actually collided are kept, as most are unique.
+    """
+
+    def __init__(self):
+        self._next_indices = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._next_indices.get(key, 0)
+
+    def mark_taken(self, key, index):
+        """Record that index is taken and return the next index to try."""
+        with self._lock:
+            next_index = max(self._next_indices.get(key, 0), index + 1)
+            self._next_indices[key] = next_index
+        return next_index
+
+
+def _transfer_with_datetime_name(
+    source_file_path,
+    dest_directory,
+    creationTime,
+    extension,
+    link_mode,
+    datetime_name_indices,
+    source_stat,
+    source_fd=None,
+):
+    # The destination file is created exclusively, so a name can't be taken
+    # by two workers, and each collision costs just one attempt.
+    key = (dest_directory, creationTime)
+    index = datetime_name_indices.get(key)
+    while True:
+        if index:
+            file_name = f"{creationTime}({index}).{extension}"
+        else:
+            file_name = f"{creationTime}.{extension}"
+        try:
+            file_copier.transfer_file(
+                source_file_path,
+                os.path.join(dest_directory, file_name),
+                link_mode,
+                source_stat,
+                source_fd,
+            )
+        except FileExistsError:
+            index = datetime_name_indices.mark_taken(key, index)
+            continue
+
+        if index:
+            datetime_name_indices.mark_taken(key, index)
+        return
+
+
+def _readExifCreationTime(source_file_path):
+    """Like _getExifCreationTime, but returns None if there's no usable
+    creation time. Runs in the worker processes of sort_photorec_folder."""
+    try:
+        with open(source_file_path, "rb") as image:
+            return _getExifCreationTime(image)
+    except Exception as e:
+        logger.warning(
+            f"Using original filename for {source_file_path} due to: {e}"
+        )
+        return None
+
+
+def _copy_file(
+    source_entry: os.DirEntry,
+    dest_directory: str,
+    file_name: str,
+    extension: str,
+    enable_datetime_filename: bool,
+    link_mode: str,
+    datetime_name_indices: _DatetimeNameIndices,
+    creationTime: str = None,
+):
+    """Copy one file; runs in the worker threads of sort_photorec_folder.
+
+    For the datetime filename, the EXIF data is read here unless it was read
+    already and passed as creationTime.
+    """
+    source_file_path = source_entry.path
+    # on Windows, this comes for free with the directory listing
+    source_stat = source_entry.stat()
+
+    if not enable_datetime_filename:
+        _transfer_new_file(
+            source_file_path,
+            os.path.join(dest_directory, file_name),
+            link_mode,
+            source_stat,
+        )
+        return
+
+    if creationTime is not None:
+        _transfer_with_datetime_name(
+            source_file_path,
+            dest_directory,
+            creationTime,
+            extension,
+            link_mode,
+            datetime_name_indices,
+            source_stat,
+        )
+        return
+
+    # The file is opened only once, for reading the EXIF data as well as for
+    # copying it, which also reuses the header already in the page cache.
+    with open(source_file_path, "rb") as source_file:
+        try:
+            creationTime = _getExifCreationTime(source_file)
+        except Exception as e:
+            logger.warning(
+                f"Using original filename for {source_file_path} due to: {e}"
+            )
+            _transfer_new_file(
+                source_file_path,
+                os.path.join(dest_directory, file_name),
+                link_mode,
+                source_stat,
+                source_file.fileno(),
+            )
+            return
+
+        _transfer_with_datetime_name(
+            source_file_path,
+            dest_directory,
+            creationTime,
+            extension,
+            link_mode,
+            datetime_name_indices,
+            source_stat,
+            source_file.fileno(),
+        )
+
+
+class _CopyProgress:
+    """Counts the copied files and logs the progress every
+    LOG_FREQUENCY_FILE_COUNT files.
+
+    The source tree is walked while copying, so the total number of files is
+    only known at the end.
+    """
+
+    def __init__(self):
+        self.found_file_count = 0
+        self.processed_file_count = 0
+        self._next_log_file_count = LOG_FREQUENCY_FILE_COUNT
+
+    def collect(self, copies):
+        for copy in copies:
+            # re-raises any exception from the worker thread
+            copy.result()
+
+            self.processed_file_count += 1
+            if self.processed_file_count >= self._next_log_file_count:
+                logger.info(
+                    f"{self.processed_file_count:,} / "
+                    f"{self.found_file_count:,} files found so far processed."
+                )
+                self._next_log_file_count += LOG_FREQUENCY_FILE_COUNT
 
 
 def sort_photorec_folder(
@@ -33,8 +344,19 @@ def sort_photorec_folder(
     enable_keep_filename: bool,
     enable_datetime_filename: bool,
     min_event_delta_days: int,
+    worker_count: int = DEFAULT_WORKER_COUNT,
+    link_mode: str = "copy",
 ):
+    """Copy (or link) the files PhotoRec recovered to source into destination,
+    sorted by file type, then sort the JPG files by date and split
+    directories with more than max_files_per_folder files.
 
+    With enable_datetime_filename on a regular (GIL) Python build, the EXIF
+    data is read by a pool of worker processes started with the "spawn"
+    method, which imports the __main__ module again in each of them. A script
+    calling this function then needs to guard the call with
+    'if __name__ == "__main__":', and can't be read from stdin.
+    """
     if not os.path.isdir(source):
         raise ValueError(f"Source directory does not exist: {source}")
     if not os.path.isdir(destination):
@@ -42,6 +364,18 @@ def sort_photorec_folder(
             "Destination directory does not exist. "
             f"Please create the directory first: {destination}"
         )
+    if worker_count < 1:
+        raise ValueError(f"Worker count must be at least 1: {worker_count}")
+    if link_mode not in file_copier.LINK_MODES:
+        raise ValueError(f"Invalid link mode: {link_mode}")
+    if (
+        link_mode != "copy"
+        and os.stat(source).st_dev != os.stat(destination).st_dev
+    ):
+        raise ValueError(
+            f"Source and destination must be on the same file system "
+            f"to use '{link_mode}' links."
+        )
 
     logger.info(
         "Reading from source '%s', writing to destination '%s' (max %i files per directory, splitting by year %s)."
@@ -60,74 +394,130 @@ def sort_photorec_folder(
         )
     else:
         logger.info("Filename Plan: Rename files sequentially, like '1.jpg'")
+    # keeping the original filenames takes precedence, as in the plan above
+    use_datetime_filename = (
+        enable_datetime_filename and not enable_keep_filename
+    )
+
+    if not _is_gil_enabled():
+        logger.info(
+            "Running on free-threaded Python with "
+            f"{worker_count} worker threads."
+        )
+
+    # Copying is I/O bound, so the files are copied by a pool of threads. The
+    # number of queued copies is bounded to keep memory usage flat.
+    max_pending_copies = worker_count * 4
+    pending_copies = set()
+    created_dest_directories = set()
 
-    total_file_count = getNumberOfFilesInFolderRecursively(source)
-    if total_file_count > 100:
-        log_frequency_file_count = int(total_file_count / 100)
+    # Parsing EXIF data is CPU bound (exifread is pure Python), so with the
+    # GIL it would only use a single core in the copy threads. Then, it's done
+    # by a pool of processes instead, and the copy threads get the results.
+    # The processes read the source files as well, so there are no more of
+    # them than copy threads (e.g., just one for spinning disks).
+    if use_datetime_filename and _is_gil_enabled():
+        exif_pool = ProcessPoolExecutor(
+            max_workers=min(worker_count, os.cpu_count() or 1),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
     else:
-        log_frequency_file_count = total_file_count
-    logger.info(f"Total files to copy: {total_file_count:,}")
-
-    cur_file_number = 0
-    for root, dirs, files in os.walk(source, topdown=False):
-
-        for file in files:
-            extension = os.path.splitext(file)[1][1:].lower()
-            source_file_path = os.path.join(root, file)
-
-            if extension:
-                dest_directory = os.path.join(destination, extension)
-            else:
-                dest_directory = os.path.join(destination, "no_extension")
-
-            if not os.path.exists(dest_directory):
-                os.mkdir(dest_directory)
-
-            if enable_keep_filename:
-                file_name = file
-                
-            elif enable_datetime_filename:
-                index = 0
-                file_name = file  # Fallback by default
-                try:
-                    with open(source_file_path, "rb") as image:
-                        try:
-                            exifTags = exifread.process_file(image, details=False)
-                        except (KeyError, Exception) as e:
-                            logger.warning(f"EXIF error in {source_file_path}: {e}")
-                            # Immediately fall back to original filename
-                            raise
-                        
-                        creationTime = jpg_sorter.getMinimumCreationTime(exifTags)
-                        if not creationTime:
-                            raise ValueError("No creation time found in EXIF")
-                        
-                        creationTime = strptime(str(creationTime), "%Y:%m:%d %H:%M:%S")
-                        creationTime = strftime("%Y%m%d_%H%M%S", creationTime)
-                        
-                        file_name = f"{creationTime}.{extension.lower()}"
-                        while os.path.exists(os.path.join(dest_directory, file_name)):
-                            index += 1
-                            file_name = f"{creationTime}({index}).{extension.lower()}"
-                            
-                except Exception as e:
-                    logger.warning(f"Using original filename for {source_file_path} due to: {e}")
-                    file_name = file
-            else:
+        exif_pool = None
+
+    # sequential filenames are numbered per extension, i.e., 1.jpg, 1.pdf, ...
+    file_numbers = defaultdict(int)
+    datetime_name_indices = _DatetimeNameIndices()
+    progress = _CopyProgress()
+    executor = ThreadPoolExecutor(max_workers=worker_count)
+    try:
+        for source_entries in _iter_directories(source):
+            progress.found_file_count += len(source_entries)
+
+            # The files of each source directory are grouped by destination
+            # directory, so that those are filled one after the other instead
+            # of all at once, which keeps their metadata hot in the file
+            # system caches.
+            for extension, extension_entries in _group_by_extension(
+                source_entries
+            ).items():
                 if extension:
-                    file_name = str(cur_file_number) + "." + extension.lower()
+                    dest_directory = os.path.join(destination, extension)
                 else:
-                    file_name = str(cur_file_number)
+                    dest_directory = os.path.join(destination, "no_extension")
 
-            dest_file_path = os.path.join(dest_directory, file_name)
-            if not os.path.exists(dest_file_path):
-                shutil.copy2(source_file_path, dest_file_path)
+                # There are only a handful of destination directories (one per
+                # extension), so only create each once instead of checking for
+                # it again for every source directory.
+                if dest_directory not in created_dest_directories:
+                    os.makedirs(dest_directory, exist_ok=True)
+                    created_dest_directories.add(dest_directory)
 
-            cur_file_number += 1
-            if (cur_file_number % log_frequency_file_count) == 0:
-                logger.info(
-                    f"{cur_file_number} / {total_file_count} processed ({cur_file_number/total_file_count:.2%})."
-                )
+                if exif_pool is not None:
+                    creationTimes = exif_pool.map(
+                        _readExifCreationTime,
+                        [
+                            source_entry.path
+                            for source_entry in extension_entries
+                        ],
+                        chunksize=64,
+                    )
+                else:
+                    creationTimes = repeat(None)
+
+                for source_entry, creationTime in zip(
+                    extension_entries, creationTimes
+                ):
+                    if enable_keep_filename or enable_datetime_filename:
+                        # for the datetime filename, this is the fallback
+                        file_name = source_entry.name
+                    else:
+                        file_numbers[extension] += 1
+                        if extension:
+                            file_name = (
+                                f"{file_numbers[extension]}.{extension}"
+                            )
+                        else:
+                            file_name = str(file_numbers[extension])
+
+                    if len(pending_copies) >= max_pending_copies:
+                        done_copies, pending_copies = wait(
+                            pending_copies, return_when=FIRST_COMPLETED
+                        )
+                        progress.collect(done_copies)
+
+                    # the worker processes report no usable EXIF date/time
+                    # as None, the original filename is kept then
+                    use_datetime_name = use_datetime_filename and (
+                        exif_pool is None or creationTime is not None
+                    )
+
+                    pending_copies.add(
+                        executor.submit(
+                            _copy_file,
+                            source_entry,
+                            dest_directory,
+                            file_name,
+                            extension,
+                            use_datetime_name,
+                            link_mode,
+                            datetime_name_indices,
+                            creationTime,
+                        )
+                    )
+
+        progress.collect(pending_copies)
+    except BaseException:
+        # Don't finish all queued copies before stopping, e.g. on Ctrl+C, as
+        # the shutdown below would (cancel_futures requires Python 3.9).
+        for copy in pending_copies:
+            copy.cancel()
+        raise
+    finally:
+        executor.shutdown()
+        if exif_pool is not None:
+            exif_pool.shutdown()
+
+    logger.info(f"Processed {progress.processed_file_count:,} files in total.")
 
     logger.info(
         "Starting special file treatment (JPG sorting and folder splitting)..."